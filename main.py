@@ -62,6 +62,7 @@ def main():
     os.makedirs(os.path.join(OUTPUT_DIR, "breadth_analysis"), exist_ok=True)
     os.makedirs(os.path.join(OUTPUT_DIR, "depth_analysis"), exist_ok=True)
     os.makedirs(os.path.join(OUTPUT_DIR, "taxonomy"), exist_ok=True)
+    os.makedirs(os.path.join(OUTPUT_DIR, "cost_analysis"), exist_ok=True)
 
     # Step 1: Parse the raw CPC files into JSON and TSV formats
     run_script(os.path.join(SCRIPTS_DIR, "cpc_parser.py"))
@@ -72,6 +73,7 @@ def main():
     supplementary_scripts = [
         "analyze_cluster_breadth.py",
         "analyze_hierarchy_permutations.py",
+        "estimate_classification_cost.py",
         "prepare_for_echarts.py",
         "sample_hierarchy.py"
     ]
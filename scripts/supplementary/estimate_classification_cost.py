@@ -0,0 +1,394 @@
+#!/usr/bin/env python3
+"""
+Estimate the cost and latency of classifying a conversation by walking the
+CPC hierarchy one level at a time with prompts/classification.md.
+
+Every node is annotated in a single bottom-up pass with its subtree leaf count,
+prior mass, max and expected remaining depth, and expected remaining calls and
+tokens. The per-leaf walk costs are then aggregated into distributions of model
+calls, tokens and latency per conversation, weighted by a prior over leaves
+(uniform unless outputs/cost_analysis/leaf_prior.tsv is present).
+"""
+import json
+import math
+import os
+from collections import Counter
+import matplotlib.pyplot as plt
+import numpy as np
+
+# --- Configuration ---
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+OUTPUT_DIR = os.path.join(BASE_DIR, "outputs")
+HIERARCHY_FILE = os.path.join(OUTPUT_DIR, "cpc_hierarchy.json")
+PROMPT_FILE = os.path.join(BASE_DIR, "prompts", "classification.md")
+COST_ANALYSIS_DIR = os.path.join(OUTPUT_DIR, "cost_analysis")
+# Optional tab-separated "code<TAB>weight" lines. Weights on internal codes are spread evenly
+# over the leaves beneath them; leaves not covered by any line get zero weight.
+PRIOR_FILE = os.path.join(COST_ANALYSIS_DIR, "leaf_prior.tsv")
+REPORT_FILE = os.path.join(COST_ANALYSIS_DIR, "cpc_cost_report.txt")
+CALLS_CHART_FILE = os.path.join(COST_ANALYSIS_DIR, "cpc_calls_distribution.png")
+
+# Per-call assumptions. Tokens are whitespace tokens, as in analyze_cluster_breadth.py.
+CONVERSATION_TOKENS = 1500
+OUTPUT_TOKENS = 120
+BASE_LATENCY_S = 0.5
+PREFILL_S_PER_TOKEN = 0.0002
+DECODE_S_PER_TOKEN = 0.02
+# A node with a single child leaves nothing to choose, so no call is made for it.
+SKIP_SINGLE_OPTION_CALLS = True
+
+TOP_N = 15
+
+ANTHROPIC_ORANGE = '#f9734a'
+
+def simple_tokenizer(text):
+    return text.split()
+
+def count_tokens(name_list):
+    total = 0
+    for name in name_list:
+        if isinstance(name, str):
+            total += len(simple_tokenizer(name))
+    return total
+
+def prompt_overhead_tokens():
+    """Tokens in the classification template, excluding its placeholders."""
+    if not os.path.exists(PROMPT_FILE):
+        return 0
+    with open(PROMPT_FILE, "r", encoding='utf-8') as f:
+        template = f.read()
+    template = template.replace("{conversation}", "").replace("{options_str}", "")
+    return len(simple_tokenizer(template))
+
+def load_prior():
+    """Returns a {code: weight} dict as read from PRIOR_FILE, or None for a uniform prior."""
+    if not os.path.exists(PRIOR_FILE):
+        return None
+    prior = {}
+    with open(PRIOR_FILE, "r", encoding='utf-8') as f:
+        for line in f:
+            parts = line.strip().split('\t')
+            if len(parts) < 2:
+                continue
+            try:
+                weight = float(parts[1])
+            except ValueError:
+                continue  # header or malformed line
+            if not math.isfinite(weight) or weight < 0:
+                print("Warning: Ignoring invalid prior weight {} for '{}'.".format(parts[1], parts[0]))
+                continue
+            prior[parts[0]] = prior.get(parts[0], 0.0) + weight
+    return prior
+
+def spread_prior(nodes, prior, leaf_prior, matched):
+    """
+    Recursively distributes prior weights onto leaves, splitting the weight of
+    an internal code evenly across its subtree. Returns the leaf codes under nodes.
+    """
+    leaves = []
+    for node in nodes:
+        code = node.get('code', '')
+        node_leaves = spread_prior(node['children'], prior, leaf_prior, matched) if node.get('children') else [code]
+        if code in prior:
+            matched.add(code)
+            share = prior[code] / len(node_leaves)
+            for leaf in node_leaves:
+                leaf_prior[leaf] = leaf_prior.get(leaf, 0.0) + share
+        leaves.extend(node_leaves)
+    return leaves
+
+def resolve_prior(hierarchy):
+    """Returns a {leaf code: weight} dict, or None for a uniform prior."""
+    prior = load_prior()
+    if prior is None:
+        return None
+    leaf_prior, matched = {}, set()
+    spread_prior(hierarchy, prior, leaf_prior, matched)
+    unmatched = len(prior) - len(matched)
+    if unmatched:
+        print("Warning: {:,} of {:,} codes in {} are not in the hierarchy and were ignored.".format(
+            unmatched, len(prior), PRIOR_FILE))
+    return leaf_prior
+
+def decision_cost(options_tokens, num_options, fixed_input_tokens):
+    """Returns (calls, tokens, latency) for choosing among num_options children."""
+    if num_options == 0 or (SKIP_SINGLE_OPTION_CALLS and num_options == 1):
+        return 0, 0, 0.0
+    input_tokens = fixed_input_tokens + options_tokens
+    latency = BASE_LATENCY_S + input_tokens * PREFILL_S_PER_TOKEN + OUTPUT_TOKENS * DECODE_S_PER_TOKEN
+    return 1, input_tokens + OUTPUT_TOKENS, latency
+
+def annotate(node, prior, fixed_input_tokens):
+    """
+    Bottom-up pass: fills node['stats'] from its children's stats.
+    Expectations are weighted by prior mass, falling back to leaf counts
+    where a subtree carries no prior mass.
+    """
+    children = node.get('children') or []
+    for child in children:
+        annotate(child, prior, fixed_input_tokens)
+
+    if not children:
+        mass = 1.0 if prior is None else prior.get(node.get('code', ''), 0.0)
+        node['stats'] = {
+            'leaf_count': 1, 'mass': mass, 'max_depth': 0, 'exp_depth': 0.0,
+            'options_tokens': 0, 'exp_calls': 0.0, 'exp_options_tokens': 0.0,
+            'exp_tokens': 0.0, 'exp_latency': 0.0,
+        }
+        return
+
+    child_stats = [child['stats'] for child in children]
+    mass = sum(s['mass'] for s in child_stats)
+    weights = [s['mass'] for s in child_stats] if mass > 0 else [s['leaf_count'] for s in child_stats]
+    total_weight = float(sum(weights))
+    options_tokens = count_tokens([child.get('title', '') for child in children])
+    calls, tokens, latency = decision_cost(options_tokens, len(children), fixed_input_tokens)
+    sent_options_tokens = options_tokens if calls else 0
+
+    def expect(key):
+        return sum(w * s[key] for w, s in zip(weights, child_stats)) / total_weight
+
+    node['stats'] = {
+        'leaf_count': sum(s['leaf_count'] for s in child_stats),
+        'mass': mass,
+        'max_depth': 1 + max(s['max_depth'] for s in child_stats),
+        'exp_depth': 1 + expect('exp_depth'),
+        'options_tokens': options_tokens,
+        'exp_calls': calls + expect('exp_calls'),
+        'exp_options_tokens': sent_options_tokens + expect('exp_options_tokens'),
+        'exp_tokens': tokens + expect('exp_tokens'),
+        'exp_latency': latency + expect('exp_latency'),
+    }
+
+def collect_leaf_walks(node, path_cost, fixed_input_tokens, walks, decisions, section=None, parent=None):
+    """
+    Accumulates the root-to-leaf cost of every leaf under an annotated node
+    into walks, and every internal node that makes a model call into decisions
+    as a (node, parent) pair.
+    """
+    if not node.get('children'):
+        walks.append((node['stats']['mass'], section) + path_cost)
+        return
+
+    options_tokens = node['stats']['options_tokens']
+    calls, tokens, latency = decision_cost(options_tokens, len(node['children']), fixed_input_tokens)
+    if calls:
+        decisions.append((node, parent))
+    depth, path_calls, path_options, path_tokens, path_latency = path_cost
+    step = (depth + 1, path_calls + calls, path_options + (options_tokens if calls else 0),
+            path_tokens + tokens, path_latency + latency)
+
+    for child in node['children']:
+        collect_leaf_walks(child, step, fixed_input_tokens, walks, decisions, section or child.get('code', ''), node)
+
+def collapse_savings(node, parent, fixed_input_tokens):
+    """
+    Returns (tokens, latency) saved per visit to the parent if node's options
+    are merged into the parent's list: node's call goes away, but its options
+    replace its own title in the parent's list for everyone reaching the parent.
+    """
+    ps, s = parent['stats'], node['stats']
+    share = s['mass'] / ps['mass'] if ps['mass'] > 0 else s['leaf_count'] / float(ps['leaf_count'])
+    _, parent_tokens, parent_latency = decision_cost(ps['options_tokens'], len(parent['children']), fixed_input_tokens)
+    _, node_tokens, node_latency = decision_cost(s['options_tokens'], len(node['children']), fixed_input_tokens)
+    merged_options = ps['options_tokens'] - count_tokens([node.get('title', '')]) + s['options_tokens']
+    merged_count = len(parent['children']) - 1 + len(node['children'])
+    _, merged_tokens, merged_latency = decision_cost(merged_options, merged_count, fixed_input_tokens)
+    return (parent_tokens + share * node_tokens - merged_tokens,
+            parent_latency + share * node_latency - merged_latency)
+
+def format_share(share):
+    """Formats a probability as a percentage, without rounding small shares to zero."""
+    return "<0.01%" if share < 0.0001 else "{:.2f}%".format(share * 100)
+
+def weighted_summary(values, weights):
+    """Returns (mean, p50, p90, p99, max) of values under the given weights."""
+    values, weights = values[weights > 0], weights[weights > 0]
+    order = np.argsort(values, kind='stable')
+    values = values[order]
+    cum = np.cumsum(weights[order])
+    total = cum[-1]
+    percentiles = [values[min(np.searchsorted(cum, q * total), len(values) - 1)] for q in (0.5, 0.9, 0.99)]
+    mean = float(np.dot(values, weights[order]) / total)
+    return [mean] + percentiles + [values[-1]]
+
+def visualize_calls_distribution(call_shares):
+    calls = sorted(call_shares.keys())
+    shares = [call_shares[c] * 100 for c in calls]
+
+    plt.figure(figsize=(12, 7))
+    bars = plt.bar(calls, shares, color=ANTHROPIC_ORANGE, alpha=0.9)
+    plt.xlabel('Model Calls per Conversation', fontsize=12)
+    plt.ylabel('Share of Conversations (%)', fontsize=12)
+    plt.title('Distribution of Classification Calls over the CPC Hierarchy', fontsize=14)
+    plt.xticks(calls)
+    for bar, pct in zip(bars, shares):
+        plt.text(bar.get_x() + bar.get_width() / 2, bar.get_height(),
+                 '{:.1f}%'.format(pct), ha='center', va='bottom', fontsize=9)
+    plt.grid(axis='y', linestyle='--', alpha=0.7)
+    plt.tight_layout()
+    plt.savefig(CALLS_CHART_FILE, dpi=300)
+    plt.close()
+    print("Visualization saved to {}".format(CALLS_CHART_FILE))
+
+def estimate_cost():
+    if not os.path.exists(HIERARCHY_FILE):
+        print("Error: {} not found. Run cpc_parser.py first.".format(HIERARCHY_FILE))
+        return
+
+    with open(HIERARCHY_FILE, "r", encoding='utf-8') as f:
+        hierarchy = json.load(f)
+
+    prior = resolve_prior(hierarchy)
+    fixed_input_tokens = prompt_overhead_tokens() + CONVERSATION_TOKENS
+
+    # The section list acts as the root, so wrap it to reuse the node pass.
+    root = {'code': 'CPC', 'title': 'Top-level sections', 'children': hierarchy}
+    annotate(root, prior, fixed_input_tokens)
+    if root['stats']['mass'] <= 0:
+        print("Warning: Prior in {} matches no leaves; falling back to uniform.".format(PRIOR_FILE))
+        prior = None
+        annotate(root, prior, fixed_input_tokens)
+
+    walks, decisions = [], []
+    collect_leaf_walks(root, (0, 0, 0, 0, 0.0), fixed_input_tokens, walks, decisions)
+
+    weights = np.array([w[0] for w in walks], dtype=float)
+    weights /= weights.sum()
+    depths = np.array([w[2] for w in walks], dtype=float)
+    calls = np.array([w[3] for w in walks], dtype=float)
+    options = np.array([w[4] for w in walks], dtype=float)
+    tokens = np.array([w[5] for w in walks], dtype=float)
+    latency = np.array([w[6] for w in walks], dtype=float)
+
+    call_shares = Counter()
+    for c, w in zip(calls.astype(int), weights):
+        if w > 0:
+            call_shares[c] += w
+
+    section_mass, section_tokens, section_latency = Counter(), Counter(), Counter()
+    for (_, section, _, _, _, walk_tokens, walk_latency), w in zip(walks, weights):
+        section_mass[section] += w
+        section_tokens[section] += w * walk_tokens
+        section_latency[section] += w * walk_latency
+
+    total_mass = root['stats']['mass']
+    use_mass = prior is not None
+
+    def reach_of(stats):
+        return stats['mass'] / total_mass if use_mass else stats['leaf_count'] / float(root['stats']['leaf_count'])
+
+    # Retrieval shortcuts replace a decision's options list, so they save the
+    # options tokens it adds per conversation. Collapsing a node into its parent
+    # instead saves its call but sends its options to everyone reaching the parent.
+    # The root is skipped in both: it can neither be shortcut nor collapsed.
+    shortcut_load, collapse_load = [], []
+    for node, parent in decisions:
+        if parent is None:
+            continue
+        s = node['stats']
+        reach = reach_of(s)
+        if reach <= 0:
+            continue
+        shortcut_load.append((reach * s['options_tokens'], reach, node, s))
+        saved_tokens, saved_latency = collapse_savings(node, parent, fixed_input_tokens)
+        parent_reach = reach_of(parent['stats'])
+        collapse_load.append((parent_reach * saved_tokens, parent_reach * saved_latency, reach, node, parent, s))
+    shortcut_load.sort(key=lambda d: d[0], reverse=True)
+    collapse_load.sort(key=lambda d: d[0], reverse=True)
+
+    rs = root['stats']
+    fixed_call_tokens = fixed_input_tokens + OUTPUT_TOKENS
+    lines = ["CPC Classification Cost Estimate", "="*32, ""]
+
+    lines.append("ASSUMPTIONS:")
+    lines.append("Prior: {}".format("uniform over leaves" if prior is None else PRIOR_FILE))
+    lines.append("Prompt overhead tokens: {:,}".format(fixed_input_tokens - CONVERSATION_TOKENS))
+    lines.append("Conversation tokens: {:,}".format(CONVERSATION_TOKENS))
+    lines.append("Output tokens per call: {:,}".format(OUTPUT_TOKENS))
+    lines.append("Latency per call: {}s + {}s/input token + {}s/output token".format(
+        BASE_LATENCY_S, PREFILL_S_PER_TOKEN, DECODE_S_PER_TOKEN))
+    lines.append("Single-option levels skipped: {}".format(SKIP_SINGLE_OPTION_CALLS))
+    lines.append("")
+
+    lines.append("HIERARCHY:")
+    lines.append("Leaf nodes: {:,}".format(rs['leaf_count']))
+    lines.append("Max depth: {}".format(rs['max_depth']))
+    lines.append("Expected depth: {:.2f}".format(rs['exp_depth']))
+    lines.append("")
+
+    lines.append("EXPECTED COST PER CONVERSATION:")
+    lines.append("-------------------------------")
+    lines.append("Model calls: {:.2f}".format(rs['exp_calls']))
+    lines.append("Fixed tokens: {:,.0f} ({:,} per call: prompt, conversation and output)".format(
+        rs['exp_calls'] * fixed_call_tokens, fixed_call_tokens))
+    lines.append("Options tokens: {:,.0f}".format(rs['exp_options_tokens']))
+    lines.append("Total tokens: {:,.0f}".format(rs['exp_tokens']))
+    lines.append("Latency: {:.2f}s".format(rs['exp_latency']))
+    lines.append("")
+
+    lines.append("PER-CONVERSATION DISTRIBUTION:")
+    lines.append("------------------------------")
+    lines.append("{:<16}{:>12}{:>12}{:>12}{:>12}{:>12}".format("", "mean", "p50", "p90", "p99", "max"))
+    for label, values, fmt in (("Depth", depths, "{:>12.2f}"),
+                               ("Model calls", calls, "{:>12.2f}"),
+                               ("Options tokens", options, "{:>12,.0f}"),
+                               ("Total tokens", tokens, "{:>12,.0f}"),
+                               ("Latency (s)", latency, "{:>12.2f}")):
+        lines.append("{:<16}".format(label) + "".join(fmt.format(v) for v in weighted_summary(values, weights)))
+    lines.append("")
+
+    lines.append("MODEL CALLS PER CONVERSATION:")
+    lines.append("-----------------------------")
+    for c in sorted(call_shares.keys()):
+        lines.append("{} calls: {}".format(c, format_share(call_shares[c])))
+    lines.append("")
+
+    lines.append("EXPECTED COST BY SECTION:")
+    lines.append("-------------------------")
+    for node in hierarchy:
+        section = node.get('code', '')
+        if section_mass[section] <= 0:
+            continue
+        lines.append("{} ({} of conversations): {:,.0f} tokens, {:.2f}s".format(
+            section, format_share(section_mass[section]),
+            section_tokens[section] / section_mass[section],
+            section_latency[section] / section_mass[section]))
+    lines.append("")
+
+    def describe(node, reach, s):
+        lines.append("Node: {} - {}".format(node.get('code', ''), node.get('title', '')[:80]))
+        lines.append("Reached by: {} | Options: {:,} | Options tokens: {:,}".format(
+            format_share(reach), len(node['children']), s['options_tokens']))
+        lines.append("Subtree leaves: {:,} | Remaining depth (max/expected): {}/{:.2f}".format(
+            s['leaf_count'], s['max_depth'], s['exp_depth']))
+        lines.append("Expected remaining from here: {:.2f} calls, {:,.0f} tokens, {:.2f}s".format(
+            s['exp_calls'], s['exp_tokens'], s['exp_latency']))
+
+    lines.append("RETRIEVAL SHORTCUT CANDIDATES (options tokens per conversation):")
+    lines.append("-----------------------------------------------------------------")
+    lines.append("")
+    for load, reach, node, s in shortcut_load[:TOP_N]:
+        describe(node, reach, s)
+        lines.append("Options tokens per conversation: {:,.0f}".format(load))
+        lines.append("")
+
+    lines.append("COLLAPSE CANDIDATES (tokens saved per conversation by merging into the parent):")
+    lines.append("-------------------------------------------------------------------------------")
+    lines.append("")
+    for saved_tokens, saved_latency, reach, node, parent, s in collapse_load[:TOP_N]:
+        describe(node, reach, s)
+        lines.append("Merged into: {} | Saved per conversation: {:,.0f} tokens, {:.3f}s".format(
+            parent.get('code', ''), saved_tokens, saved_latency))
+        lines.append("")
+
+    os.makedirs(COST_ANALYSIS_DIR, exist_ok=True)
+    visualize_calls_distribution(call_shares)
+
+    with open(REPORT_FILE, "w", encoding='utf-8') as f:
+        f.write("\n".join(lines))
+
+    print("Analysis complete. Report saved to {}".format(REPORT_FILE))
+
+if __name__ == "__main__":
+    estimate_cost()